@@ -1,5 +1,3 @@
-from textwrap import dedent
-
 import pytest
 
 from translator.parser import (
@@ -7,40 +5,41 @@ from translator.parser import (
     ByteCodeInst,
     Command,
     Segment,
+    InvalidCommandException,
     InvalidSegmentException,
+    parse,
+    translate_line,
+    _base36,
+    fuse,
 )
 
+UPPER_CASE_INS = """
+    PUSH CONSTANT    8
+    
+    POP TEMP 7
+    
+    ADD
+    
+    
+        
+"""
+
+COMMENTED_INS = """//this is a comment
+    push temp 9
+    // push temp 9
+"""
+
 
 @pytest.mark.parametrize(
     "ins, expected",
     [
-        (
-            dedent(
-                """
-        push constant    8
-        
-        pop temp 7
-        
-        add
-        
-        
-            
-        """.upper()
-            ),
-            """push constant 8\npop temp 7\nadd""",
-        ),
+        (UPPER_CASE_INS, "push constant 8\npop temp 7\nadd"),
         ("\n\n\n", ""),
         ("\n\n\tpush temp 9\n\n\n\n\n\t", "push temp 9"),
-        (
-            dedent(
-                """//this is a comment
-             push temp 9
-             // push temp 9
-             """
-            ),
-            "push temp 9",
-        ),
+        (COMMENTED_INS, "push temp 9"),
         ("\n\n\tpush temp 9 // add to stack", "push temp 9"),
+        ("push temp 9\r\nadd\rsub\r\n", "push temp 9\nadd\nsub"),
+        ("push\ttemp \t 9  // tabs", "push temp 9"),
     ],
 )
 def test_clean_instructions(ins, expected):
@@ -176,7 +175,7 @@ def test_lt_to_asm(byte_code, asm):
         )
     ],
 )
-def test_lt_to_asm(byte_code, asm):
+def test_gt_to_asm(byte_code, asm):
     assert byte_code.to_asm() == asm
 
 
@@ -345,3 +344,133 @@ def test_pointer_to_asm(byte_code, asm):
 def test_pointer_must_be_0_or_1(byte_code):
     with pytest.raises(InvalidSegmentException):
         byte_code.to_asm()
+
+
+@pytest.mark.parametrize(
+    "line, exception",
+    [
+        ("mul", InvalidCommandException),
+        ("push stack 1", InvalidSegmentException),
+    ],
+)
+def test_invalid_inst(line, exception):
+    with pytest.raises(exception):
+        ByteCodeInst.from_string(line)
+
+
+@pytest.mark.parametrize(
+    "byte_code",
+    [
+        ByteCodeInst.from_string(line="pop constant 1"),
+        ByteCodeInst(label_suffix="", cmd=Command.PUSH),
+        ByteCodeInst("", Command.EQ, Segment.CONSTANT, 1),
+        ByteCodeInst("x", Command.EQ, Segment.CONSTANT, 1),
+    ],
+)
+def test_unsupported_command(byte_code):
+    with pytest.raises(ValueError):
+        byte_code.to_asm()
+
+
+@pytest.mark.parametrize(
+    "ins, expected",
+    [
+        ("", []),
+        ("// comment only\n\n", []),
+        (
+            "push static 2 // x = y\n\n  neg\n",
+            [
+                ByteCodeInst(
+                    label_suffix="",
+                    cmd=Command.PUSH,
+                    segment=Segment.STATIC,
+                    value=2,
+                    static_label="Test",
+                ),
+                ByteCodeInst(label_suffix="", cmd=Command.NEG),
+            ],
+        ),
+        (
+            "PUSH CONSTANT 7",
+            [
+                ByteCodeInst(
+                    label_suffix="",
+                    cmd=Command.PUSH,
+                    segment=Segment.CONSTANT,
+                    value=7,
+                    static_label="Test",
+                )
+            ],
+        ),
+    ],
+)
+def test_parse(ins, expected):
+    byte_codes = list(parse(ins, filename="Test"))
+    for byte_code in byte_codes:
+        byte_code.label_suffix = ""
+    assert byte_codes == expected
+
+
+@pytest.mark.parametrize(
+    "line, asm",
+    [
+        ("push static 3", "@Test.3\nD=M\n@SP\nA=M\nM=D\n@SP\nM=M+1"),
+        ("not", "@SP\nM=M-1\nA=M\nD=M\n@SP\nA=M\nM=!D\n@SP\nM=M+1"),
+    ],
+)
+def test_translate_line(line, asm):
+    assert translate_line(line, static_label="Test") == asm
+    assert translate_line(line, static_label="Test") == asm
+
+
+def test_translate_line_uses_unique_labels():
+    assert translate_line("eq") != translate_line("eq")
+
+
+def test_label_suffixes_are_unique():
+    suffixes = {ByteCodeInst.from_string("eq").label_suffix for _ in range(1000)}
+    assert len(suffixes) == 1000
+
+
+@pytest.mark.parametrize(
+    "n, encoded", [(0, "0"), (9, "9"), (10, "a"), (35, "z"), (36, "10"), (1295, "zz")]
+)
+def test_base36(n, encoded):
+    assert _base36(n) == encoded
+
+
+def test_byte_code_has_no_instance_dict():
+    byte_code = ByteCodeInst.from_string("push static 1", static_label="Test")
+    assert not hasattr(byte_code, "__dict__")
+    with pytest.raises(AttributeError):
+        byte_code.segmnt = Segment.LCL
+
+
+PUSH_CONSTANT_1_ASM = "@1\nD=A\n@SP\nA=M\nM=D\n@SP\nM=M+1"
+
+
+@pytest.mark.parametrize(
+    "lines, asm",
+    [
+        (["push constant 7", "add"], ["@7\nD=A\n@SP\nA=M-1\nM=M+D"]),
+        (["push constant 7", "sub"], ["@7\nD=A\n@SP\nA=M-1\nM=M-D"]),
+        (["push constant 7", "and"], ["@7\nD=A\n@SP\nA=M-1\nM=M&D"]),
+        (["push constant 7", "or"], ["@7\nD=A\n@SP\nA=M-1\nM=M|D"]),
+        (
+            ["push constant 1", "push constant 2", "sub", "not"],
+            [
+                PUSH_CONSTANT_1_ASM,
+                "@2\nD=A\n@SP\nA=M-1\nM=M-D",
+                translate_line("not"),
+            ],
+        ),
+        (["push constant 1", "neg"], [PUSH_CONSTANT_1_ASM, translate_line("neg")]),
+        (["push constant 1"], [PUSH_CONSTANT_1_ASM]),
+        (
+            ["push static 1", "and"],
+            [translate_line("push static 1", "Test"), translate_line("and")],
+        ),
+    ],
+)
+def test_fuse(lines, asm):
+    assert list(fuse(lines, static_label="Test")) == asm
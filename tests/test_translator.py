@@ -0,0 +1,59 @@
+import io
+
+import pytest
+
+from translator import _translate_one, translate, translate_files, translate_to
+
+
+def test_translate():
+    asm = translate("// Adds two constants\nPUSH CONSTANT 7\npush static 1\n\nadd\n")
+    assert asm == (
+        "@7\nD=A\n@SP\nA=M\nM=D\n@SP\nM=M+1\n"
+        "@test_static.1\nD=M\n@SP\nA=M\nM=D\n@SP\nM=M+1\n"
+        "@SP\nM=M-1\nA=M\nD=M\n@SP\nM=M-1\nA=M\nM=M+D\n@SP\nM=M+1"
+    )
+
+
+def test_translate_folds_constant_operands():
+    asm = translate("push  constant 7\n\tadd // x += 7\npush constant 2\nsub\n")
+    assert asm == "@7\nD=A\n@SP\nA=M-1\nM=M+D\n@2\nD=A\n@SP\nA=M-1\nM=M-D"
+
+
+def test_translate_rejects_constant_operands_in_source():
+    with pytest.raises(ValueError):
+        translate("add constant 7")
+
+
+def test_translate_to():
+    out = io.StringIO()
+    translate_to("PUSH CONSTANT 7 // seven\nneg\n", out)
+    assert out.getvalue() == (
+        "@7\nD=A\n@SP\nA=M\nM=D\n@SP\nM=M+1\n"
+        "@SP\nM=M-1\nA=M\nD=M\n@SP\nA=M\nM=-D\n@SP\nM=M+1\n"
+    )
+
+
+def test_translate_files(tmp_path):
+    vm_paths = [tmp_path / "Foo.vm", tmp_path / "Bar.vm"]
+    for vm_path in vm_paths:
+        vm_path.write_text("push static 0 // café\n", encoding="utf-8")
+
+    asm_paths = translate_files(vm_paths)
+
+    assert asm_paths == [tmp_path / "Foo.asm", tmp_path / "Bar.asm"]
+    assert asm_paths[0].read_text().startswith("@Foo.0\n")
+    assert asm_paths[1].read_text().startswith("@Bar.0\n")
+
+
+def test_translate_one_labels_do_not_clash(tmp_path):
+    vm_paths = [tmp_path / "Main.vm", tmp_path / "Sys.vm"]
+    for vm_path in vm_paths:
+        vm_path.write_text("push constant 1\npush constant 1\neq\n")
+
+    labels = [
+        {line for line in _translate_one(vm_path).read_text().split() if line[0] == "("}
+        for vm_path in vm_paths
+    ]
+
+    assert "(IS_EQMain.0)" in labels[0]
+    assert not labels[0] & labels[1]
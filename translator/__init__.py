@@ -1,6 +1,13 @@
 import pathlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, TextIO
 
-from translator.parser import parse, clean_instructions
+from translator.parser import (
+    COMMENT_TOKEN,
+    NEW_LINE_TOKEN,
+    fuse,
+    reset_label_counter,
+)
 
 PROJECT_07_DIR = pathlib.Path("/home/miguel/nand2tetris/projects/07")
 SIMPLE_ADD_DIR = PROJECT_07_DIR / pathlib.Path("StackArithmetic/SimpleAdd")
@@ -49,17 +56,57 @@ TEST_LATEST = TEST_CODE_DIR / f"test_{seg}/test_{seg}.vm"
 TEST_LATEST_ASM = TEST_CODE_DIR / f"test_{seg}/test_{seg}.asm"
 
 
-def translate(inst: str) -> str:
-    cleaned_inst = clean_instructions(inst, to_lower=True)
-    byte_codes = parse(cleaned_inst, filename="test_static")
-    return "\n".join([byte_code.to_asm() for byte_code in byte_codes])
+def translate_lines(inst: str, filename: str = "test_static") -> Iterator[str]:
+    """
+    Lazily translates a set of instructions into assembly, one instruction
+    at a time. Cleaning, parsing and emitting are fused into one loop over
+    the lines, and instructions already seen are emitted without building
+    a ByteCodeInst. Constants consumed straight away by a binary command
+    are folded into it, see fuse.
+    """
+    lines = (
+        " ".join(line.partition(COMMENT_TOKEN)[0].lower().split())
+        for line in inst.splitlines()
+    )
+    return fuse(filter(None, lines), static_label=filename)
+
+
+def translate(inst: str, filename: str = "test_static") -> str:
+    return NEW_LINE_TOKEN.join(translate_lines(inst, filename=filename))
+
+
+def translate_to(inst: str, out: TextIO, filename: str = "test_static") -> None:
+    """Writes the assembly of a set of instructions straight into out."""
+    for asm in translate_lines(inst, filename=filename):
+        out.write(asm)
+        out.write(NEW_LINE_TOKEN)
+
+
+def _translate_one(vm_path: pathlib.Path) -> pathlib.Path:
+    """
+    Translates a .vm file into a .asm file next to it. Labels are prefixed
+    with the file name and restart for each file, so they don't clash with
+    other files and don't depend on what the worker ran before.
+    """
+    asm_path = vm_path.with_suffix(".asm")
+    inst = vm_path.read_text(encoding="utf-8")
+    reset_label_counter()
+    with asm_path.open("w", encoding="utf-8") as out:
+        translate_to(inst, out, filename=vm_path.stem)
+    return asm_path
+
+
+def translate_files(vm_paths: Iterable[pathlib.Path]) -> List[pathlib.Path]:
+    """
+    Translates each .vm file into a .asm file next to it. Files are
+    independent, so they are translated in parallel by a pool of worker
+    processes.
+    """
+    with ProcessPoolExecutor() as executor:
+        return list(executor.map(_translate_one, vm_paths))
 
 
 if __name__ == "__main__":
-    with open(POINTER_TEST) as f:
-        inst = f.read()
-
-    with open(POINTER_TEST_ASM, "w") as f:
-        s = translate(inst)
-        f.write(s)
-        print(s)
+    s = translate(POINTER_TEST.read_text(encoding="utf-8"))
+    POINTER_TEST_ASM.write_text(s, encoding="utf-8")
+    print(s)
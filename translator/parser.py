@@ -1,28 +1,30 @@
-import random
-import re
-from dataclasses import dataclass
-from enum import Enum, auto
-from textwrap import dedent
-from typing import List, Optional
+import functools
+import itertools
+import sys
+from enum import IntEnum, auto
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 NEW_LINE_TOKEN = "\n"
 
 COMMENT_TOKEN = "//"
 
 
-def clean(ins: str) -> List[str]:
-    for line in ins.split(NEW_LINE_TOKEN):
+def clean_instructions(ins: str, to_lower: bool = False) -> str:
+    """
+    Strips comments, blank lines and redundant whitespace from a set of
+    instructions in a single pass over the source.
+    """
+    out = []
+    for line in ins.splitlines():
         line = line.strip()
-        if COMMENT_TOKEN in line:
-            line = line[: line.index(COMMENT_TOKEN)].strip()
-        if not line:
+        if not line or line[:2] == COMMENT_TOKEN:
             continue
-        line = " ".join(re.split(r"\s+", line, flags=re.UNICODE))
-        yield line
-
-
-def clean_instructions(ins: str, to_lower: bool = False) -> str:
-    inst = NEW_LINE_TOKEN.join(clean(ins))
+        line = line.partition(COMMENT_TOKEN)[0].rstrip()
+        # Most lines are already single spaced, only collapse when needed.
+        if "  " in line or "\t" in line:
+            line = " ".join(line.split())
+        out.append(line)
+    inst = NEW_LINE_TOKEN.join(out)
     return inst.lower() if to_lower else inst
 
 
@@ -34,7 +36,7 @@ class InvalidSegmentException(Exception):
     """Raised when a command is built from a non-existent command."""
 
 
-class Command(Enum):
+class Command(IntEnum):
     PUSH = 1
     POP = 2
     ADD = 3
@@ -49,26 +51,20 @@ class Command(Enum):
 
     @classmethod
     def from_string(cls, raw_cmd: str) -> "Command":
-        str_to_cmd = {
-            "push": cls.PUSH,
-            "pop": cls.POP,
-            "add": cls.ADD,
-            "sub": cls.SUB,
-            "neg": cls.NEG,
-            "eq": cls.EQ,
-            "lt": cls.LT,
-            "gt": cls.GT,
-            "not": cls.NOT,
-            "and": cls.AND,
-            "or": cls.OR,
-        }
-        try:
-            return str_to_cmd[raw_cmd]
-        except KeyError as e:
-            raise InvalidCommandException("Invalid command.") from e
-
-
-class Segment(Enum):
+        cmd = _CMD_FROM_TOKEN.get(raw_cmd)
+        if cmd is None:
+            raise InvalidCommandException("Invalid command.")
+        return cmd
+
+
+# VM command tokens are the lower case names of the members.
+_CMD_FROM_TOKEN = {cmd.name.lower(): cmd for cmd in Command}
+
+# Commands whose assembly embeds the instruction's label suffix.
+LABELLED_COMMANDS = frozenset({Command.EQ, Command.GT, Command.LT})
+
+
+class Segment(IntEnum):
     CONSTANT = auto()
     LCL = auto()
     ARG = auto()
@@ -80,32 +76,599 @@ class Segment(Enum):
 
     @classmethod
     def from_string(cls, raw_seg: str) -> "Segment":
-        str_to_seg = {
-            "constant": cls.CONSTANT,
-            "argument": cls.ARG,
-            "local": cls.LCL,
-            "this": cls.THIS,
-            "that": cls.THAT,
-            "temp": cls.TEMP,
-            "static": cls.STATIC,
-            "pointer": cls.POINTER,
-        }
-        try:
-            return str_to_seg[raw_seg]
-        except KeyError as e:
-            raise InvalidSegmentException("Invalid segment.") from e
+        segment = _SEG_FROM_TOKEN.get(raw_seg)
+        if segment is None:
+            raise InvalidSegmentException("Invalid segment.")
+        return segment
 
     def __str__(self) -> str:
-        return str(self.name).upper()
+        return self.name
+
+
+# Segment members are named after their Hack pointers, not VM tokens.
+_SEG_FROM_TOKEN = {
+    "constant": Segment.CONSTANT,
+    "argument": Segment.ARG,
+    "local": Segment.LCL,
+    "this": Segment.THIS,
+    "that": Segment.THAT,
+    "temp": Segment.TEMP,
+    "static": Segment.STATIC,
+    "pointer": Segment.POINTER,
+}
+
+
+Emitter = Callable[["ByteCodeInst"], str]
+
+
+def _asm(template: str) -> str:
+    """Cleans and interns an assembly template once at import."""
+    return sys.intern(clean_instructions(template))
+
+
+def _fixed(asm: str) -> Emitter:
+    """Emits assembly that does not depend on the instruction."""
+    return lambda inst: asm
+
+
+def _fill_value(template: str) -> Emitter:
+    """Emits a template parameterized on the instruction's value."""
+    return lambda inst: template % inst.value
+
+
+def _fill_static(template: str) -> Emitter:
+    """Emits a template parameterized on the static label and value."""
+    return lambda inst: template % (inst.static_label, inst.value)
+
+
+def _fill_pointer(template: str) -> Emitter:
+    """Emits a template parameterized on the THIS/THAT pointer."""
+    return lambda inst: template % inst._get_pointer()
+
+
+def _fill_label(template: str) -> Emitter:
+    """Emits a template parameterized on the instruction's label suffix."""
+    return lambda inst: template % {"label": inst.label_suffix}
+
+
+# *SP = value
+# SP++
+_PUSH_CONSTANT_TMPL = """
+    @%d
+    D=A
+    @SP
+    A=M
+    M=D
+    @SP
+    M=M+1
+"""
+
+# SP--
+# temp0 = *SP
+# SP--
+# *SP = *SP + temp0
+# SP++
+_ADD_TMPL = """
+    @SP
+    M=M-1
+    A=M
+    D=M
+    @SP
+    M=M-1
+    A=M
+    M=M+D
+    @SP
+    M=M+1
+"""
+
+# SP--
+# temp0 = *SP
+# SP--
+# *SP = *SP - temp0
+# SP++
+_SUB_TMPL = """
+    @SP
+    M=M-1
+    A=M
+    D=M
+    @SP
+    M=M-1
+    A=M
+    M=M-D
+    @SP
+    M=M+1
+"""
+
+# eq -> x == y
+#
+# SP--
+# y = *SP
+# SP--
+# x = *SP
+# *SP = -1 if x - y == 0 else 0
+# SP++
+_EQ_TMPL = """
+    // SP--
+    @SP
+    M=M-1
+    // D = *SP
+    A=M
+    D=M
+    // SP--
+    @SP
+    M=M-1
+    // D = *SP - D  <--> x - y
+    A=M
+    D=M-D
+    M=D
+
+    // if x == 0
+    @IS_EQ%(label)s
+    D;JEQ
+    // else
+    @ELSE%(label)s
+    D;JNE
+
+    (IS_EQ%(label)s)
+    // True in Hack ASM is -1
+    @SP
+    A=M
+    M=-1
+    // SP++
+    @SP
+    M=M+1
+    @END_IF%(label)s
+    0;JEQ
+
+    (ELSE%(label)s)
+    // False in Hack ASM is 0
+    @SP
+    A=M
+    M=0
+    // SP++
+    @SP
+    M=M+1
+
+    (END_IF%(label)s)
+    D=0
+"""
+
+# lt -> x < y
+#
+# SP--
+# y = *SP
+# SP--
+# x = *SP
+# *SP = -1 if x < y else 0
+# SP++
+_LT_TMPL = """
+    // SP--
+    @SP
+    M=M-1
+    // D = *SP
+    A=M
+    D=M
+    // SP--
+    @SP
+    M=M-1
+    // D = *SP - D  <--> x - y
+    A=M
+    D=M-D
+    M=D
+
+    // if x < 0
+    @IS_LESS_THAN%(label)s
+    D;JLT
+    // else
+    @ELSE%(label)s
+    D;JGE
+
+    (IS_LESS_THAN%(label)s)
+    // True in Hack ASM is -1
+    @SP
+    A=M
+    M=-1
+    // SP++
+    @SP
+    M=M+1
+    @END_IF%(label)s
+    0;JEQ
+
+    (ELSE%(label)s)
+    // False in Hack ASM is 0
+    @SP
+    A=M
+    M=0
+    // SP++
+    @SP
+    M=M+1
+
+    (END_IF%(label)s)
+    D=0
+"""
+
+# gt -> x > y
+#
+# SP--
+# y = *SP
+# SP--
+# x = *SP
+# *SP = -1 if x > y else 0
+# SP++
+_GT_TMPL = """
+    // SP--
+    @SP
+    M=M-1
+    // D = *SP
+    A=M
+    D=M
+    // SP--
+    @SP
+    M=M-1
+    // D = *SP - D  <--> x - y
+    A=M
+    D=M-D
+    M=D
+
+    // if x > 0
+    @IS_GT%(label)s
+    D;JGT
+    // else
+    @ELSE%(label)s
+    D;JLE
+
+    (IS_GT%(label)s)
+    // True in Hack ASM is -1
+    @SP
+    A=M
+    M=-1
+    // SP++
+    @SP
+    M=M+1
+    @END_IF%(label)s
+    0;JEQ
+
+    (ELSE%(label)s)
+    // False in Hack ASM is 0
+    @SP
+    A=M
+    M=0
+    // SP++
+    @SP
+    M=M+1
+
+    (END_IF%(label)s)
+    D=0
+"""
+
+# not -> !x
+#
+# SP--
+# *SP = !*SP
+# SP++
+_NOT_TMPL = """
+    // SP--
+    @SP
+    M=M-1
+    // D = *SP
+    A=M
+    D=M
+    // *SP = !D
+    @SP
+    A=M
+    M=!D
+    @SP
+    M=M+1
+"""
+
+# neg -> -x
+#
+# SP--
+# *SP = 0 - *SP
+# SP++
+_NEG_TMPL = """
+    // SP--
+    @SP
+    M=M-1
+    // D = *SP
+    A=M
+    D=M
+    // *SP = 0 - D
+    @SP
+    A=M
+    M=-D
+    @SP
+    M=M+1
+"""
+
+# SP--
+# temp0 = *SP
+# SP--
+# *SP = *SP & temp0
+# SP++
+_AND_TMPL = """
+    @SP
+    M=M-1
+    A=M
+    D=M
+    @SP
+    M=M-1
+    A=M
+    M=M&D
+    @SP
+    M=M+1
+"""
+
+# SP--
+# temp0 = *SP
+# SP--
+# *SP = *SP | temp0
+# SP++
+_OR_TMPL = """
+    @SP
+    M=M-1
+    A=M
+    D=M
+    @SP
+    M=M-1
+    A=M
+    M=M|D
+    @SP
+    M=M+1
+"""
+
+# Fused "push constant value" followed by a binary command:
+# *(SP-1) = *(SP-1) op value
+_CONSTANT_OPERAND_TMPL = """
+    // D = value
+    @%d
+    D=A
+    // *(SP-1) = *(SP-1) op D
+    @SP
+    A=M-1
+    M=M{op}D
+"""
+
+# addr = base + value
+# *SP = *addr
+# SP++
+_PUSH_INDEXED_TMPL = """
+    // D = offset
+    @%d
+    D=A
+    // addr = offset + base
+    @{base}
+    D=D+{src}
+    // *SP = *addr
+    A=D
+    D=M
+    @SP
+    A=M
+    M=D
+    // SP++
+    @SP
+    M=M+1
+"""
+
+# addr = base + value
+# SP--
+# *addr = *SP
+_POP_INDEXED_TMPL = """
+    // D = offset
+    @%d
+    D=A
+    // addr = offset + base
+    @{base}
+    D=D+{src}
+    // SP--
+    @SP
+    M=M-1
+    A=M
+    D=D+M  // addr = addr + RAM[SP]
+    A=D-M  // A = addr - RAM[SP]
+    M=D-A  // RAM[A] = addr - A
+"""
+
+# Base address of each indexed segment and whether it is held in a
+# pointer (LCL, ARG, THIS, THAT) or is a fixed RAM address (temp).
+_SEGMENT_BASE = {
+    Segment.LCL: ("LCL", True),
+    Segment.ARG: ("ARG", True),
+    Segment.THIS: ("THIS", True),
+    Segment.THAT: ("THAT", True),
+    Segment.TEMP: ("5", False),
+}
+
+
+def _indexed_emitters() -> Dict[Tuple[Command, Optional[Segment]], Emitter]:
+    """Builds the push/pop emitters of every indexed segment."""
+    emitters: Dict[Tuple[Command, Optional[Segment]], Emitter] = {}
+    for segment, (base, indirect) in _SEGMENT_BASE.items():
+        src = "M" if indirect else "A"
+        push = _PUSH_INDEXED_TMPL.format(base=base, src=src)
+        pop = _POP_INDEXED_TMPL.format(base=base, src=src)
+        emitters[(Command.PUSH, segment)] = _fill_value(_asm(push))
+        emitters[(Command.POP, segment)] = _fill_value(_asm(pop))
+    return emitters
+
+
+# *SP = *static
+# SP++
+_PUSH_STATIC_TMPL = """
+    @%s.%d
+    D=M
+    @SP
+    A=M
+    M=D
+    // SP++
+    @SP
+    M=M+1
+"""
+
+# SP--
+# *static = *SP
+_POP_STATIC_TMPL = """
+    // SP--
+    @SP
+    M=M-1
+    // temp = *SP
+    A=M
+    D=M
+    // *static = temp
+    @%s.%d
+    M=D
+"""
+
+# *SP = THIS/THAT
+# SP++
+_PUSH_POINTER_TMPL = """
+    // temp = THIS/THAT
+    @%s
+    D=M
+    // *SP = temp
+    @SP
+    A=M
+    M=D
+    // SP++
+    @SP
+    M=M+1
+"""
+
+# SP--
+# THIS/THAT = *SP
+_POP_POINTER_TMPL = """
+    // SP--
+    @SP
+    M=M-1
+    // temp = *SP
+    A=M
+    D=M
+    // pointer = temp
+    @%s
+    M=D
+"""
+
+# Binary commands that can take a constant operand straight from the
+# instruction, mapped to their Hack ALU operator.
+_CONSTANT_OPERATORS = {
+    Command.ADD: "+",
+    Command.SUB: "-",
+    Command.AND: "&",
+    Command.OR: "|",
+}
+
+# Maps every supported (command, segment) pair to the function emitting
+# its assembly.
+_ASM_EMITTERS: Dict[Tuple[Command, Optional[Segment]], Emitter] = {
+    (Command.PUSH, Segment.CONSTANT): _fill_value(_asm(_PUSH_CONSTANT_TMPL)),
+    **_indexed_emitters(),
+    (Command.PUSH, Segment.STATIC): _fill_static(_asm(_PUSH_STATIC_TMPL)),
+    (Command.POP, Segment.STATIC): _fill_static(_asm(_POP_STATIC_TMPL)),
+    (Command.PUSH, Segment.POINTER): _fill_pointer(_asm(_PUSH_POINTER_TMPL)),
+    (Command.POP, Segment.POINTER): _fill_pointer(_asm(_POP_POINTER_TMPL)),
+    (Command.ADD, None): _fixed(_asm(_ADD_TMPL)),
+    (Command.SUB, None): _fixed(_asm(_SUB_TMPL)),
+    (Command.EQ, None): _fill_label(_asm(_EQ_TMPL)),
+    (Command.LT, None): _fill_label(_asm(_LT_TMPL)),
+    (Command.GT, None): _fill_label(_asm(_GT_TMPL)),
+    (Command.NOT, None): _fixed(_asm(_NOT_TMPL)),
+    (Command.NEG, None): _fixed(_asm(_NEG_TMPL)),
+    (Command.AND, None): _fixed(_asm(_AND_TMPL)),
+    (Command.OR, None): _fixed(_asm(_OR_TMPL)),
+}
+
+
+# Source of unique label suffixes for instructions that don't get one.
+_label_counter = itertools.count()
+
+
+def reset_label_counter() -> None:
+    """Restarts label suffixes from zero, e.g. at the start of a new file."""
+    global _label_counter
+    _label_counter = itertools.count()
+
+
+_BASE36_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def _base36(n: int) -> str:
+    """Encodes a non-negative integer in base 36 to keep labels short."""
+    digits = []
+    while True:
+        n, digit = divmod(n, 36)
+        digits.append(_BASE36_DIGITS[digit])
+        if not n:
+            return "".join(reversed(digits))
+
+
+def _next_label_suffix(namespace: Optional[str] = None) -> str:
+    """
+    Returns a fresh label suffix for an instruction that needs one. Like
+    static variables, suffixes are prefixed with the file's namespace so
+    files linked into one program don't define the same labels.
+    """
+    suffix = _base36(next(_label_counter))
+    if namespace is None:
+        return suffix
+    return f"{namespace}.{suffix}"
+
+
+# _ASM_EMITTERS flattened into a list indexed by
+# (cmd << _SEGMENT_BITS) | segment, so dispatch is a list index instead
+# of hashing a tuple.
+_SEGMENT_BITS = 4
+assert max(Segment) < 1 << _SEGMENT_BITS, "Segments overflow the dispatch index."
+
+_ASM_EMITTER_TABLE: List[Optional[Emitter]] = [None] * (
+    (max(Command) + 1) << _SEGMENT_BITS
+)
+for (_cmd, _segment), _emit in _ASM_EMITTERS.items():
+    _ASM_EMITTER_TABLE[(_cmd << _SEGMENT_BITS) | (_segment or 0)] = _emit
+del _cmd, _segment, _emit
 
 
-@dataclass
 class ByteCodeInst:
-    label_suffix: str
-    cmd: Command
-    segment: Optional[Segment] = None
-    value: Optional[int] = None
-    static_label: Optional[str] = None
+    # Written by hand rather than as a dataclass, which only learned to
+    # generate __slots__ in Python 3.10.
+    __slots__ = ("label_suffix", "cmd", "segment", "value", "static_label")
+
+    def __init__(
+        self,
+        label_suffix: str,
+        cmd: Command,
+        segment: Optional[Segment] = None,
+        value: Optional[int] = None,
+        static_label: Optional[str] = None,
+    ) -> None:
+        self.label_suffix = label_suffix
+        self.cmd = cmd
+        self.segment = segment
+        self.value = value
+        self.static_label = static_label
+
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(label_suffix={self.label_suffix!r}, "
+            f"cmd={self.cmd!r}, segment={self.segment!r}, value={self.value!r}, "
+            f"static_label={self.static_label!r})"
+        )
+
+    def _fields(
+        self,
+    ) -> Tuple[str, Command, Optional[Segment], Optional[int], Optional[str]]:
+        """Returns the instruction fields in declaration order."""
+        return (
+            self.label_suffix,
+            self.cmd,
+            self.segment,
+            self.value,
+            self.static_label,
+        )
 
     @classmethod
     def from_string(
@@ -115,629 +678,142 @@ class ByteCodeInst:
         static_label: Optional[str] = None,
     ) -> "ByteCodeInst":
         if label_suffix is None:
-            label_suffix = str(random.randint(0, 1_000_000))
-
-        tokens = line.split()
+            label_suffix = _next_label_suffix(static_label)
 
-        try:
-            raw_cmd, raw_seg, value = tokens
-        except ValueError:
-            return cls(label_suffix, Command.from_string(tokens[0]))
+        cmd, segment, value = _parse_fields(line)
+        if segment is None:
+            return cls(label_suffix, cmd)
 
-        return cls(
-            label_suffix,
-            Command.from_string(raw_cmd),
-            Segment.from_string(raw_seg),
-            int(value),
-            static_label,
-        )
+        return cls(label_suffix, cmd, segment, value, static_label)
 
     def to_asm(self) -> str:
         """
         Returns a clean set of assembly instructions that performs
         the byte code operation.
         """
-        try:
-            build_instruction = self._handlers_map()[self.segment]
-            return clean_instructions(build_instruction())
-        except KeyError:
-            pass
-        try:
-            build_instruction = self._handlers_map()[self.cmd]
-            return clean_instructions(build_instruction())
-        except KeyError:
+        if self.cmd in LABELLED_COMMANDS:
+            if not self.label_suffix and self.segment is None:
+                return _UNLABELLED_ASM[self.cmd]
+            # Labels are unique per instruction, caching them never hits.
+            return self._build_asm()
+        static_label = self.static_label if self.segment == Segment.STATIC else None
+        return _emit_asm(self.cmd, self.segment, self.value, static_label)
+
+    def _build_asm(self) -> str:
+        """Builds the assembly instructions for the byte code operation."""
+        emit = _ASM_EMITTER_TABLE[(self.cmd << _SEGMENT_BITS) | (self.segment or 0)]
+        if emit is None:
             raise ValueError("Unsupported command.")
+        return emit(self)
 
-    def _handlers_map(self):
-        """Maps segments and commands to a handler."""
-        return {
-            Segment.CONSTANT: self._build_push_constant,
-            Segment.TEMP: self._handle_temp,
-            Segment.STATIC: self._handle_static,
-            Segment.POINTER: self._handle_pointer,
-            Segment.LCL: self._handle_generic_segment,
-            Segment.ARG: self._handle_generic_segment,
-            Segment.THIS: self._handle_generic_segment,
-            Segment.THAT: self._handle_generic_segment,
-            Command.ADD: self._build_add,
-            Command.SUB: self._build_sub,
-            Command.EQ: self._build_eq,
-            Command.GT: self._build_gt,
-            Command.NOT: self._build_not,
-            Command.NEG: self._build_neg,
-            Command.AND: self._build_and,
-            Command.OR: self._build_or,
-        }
-
-    def _handle_temp(self):
-        """Handle push/pop temp case."""
-        if self.cmd == Command.PUSH:
-            inst = self._build_push_temp()
-        else:
-            inst = self._build_pop_temp()
-        return inst
-
-    def _handle_static(self):
-        """Handle push/pop static case."""
-        if self.cmd == Command.PUSH:
-            inst = self._build_push_static()
-        else:
-            inst = self._build_pop_static()
-        return inst
-
-    def _handle_pointer(self):
-        """Handle push/pop pointer case."""
-        if self.cmd == Command.PUSH:
-            inst = self._build_push_pointer()
-        else:
-            inst = self._build_pop_pointer()
-        return inst
-
-    def _handle_generic_segment(self):
-        """Push/Pop to/from LCL, ARG, THIS, THAT"""
-        if self.cmd == Command.PUSH:
-            inst = self._build_push_segment()
-        else:
-            inst = self._build_pop_segment()
-        return inst
-
-    def _build_push_constant(self) -> str:
-        """
-        *SP = value
-        SP++
-        """
-        value = self.value
-        return dedent(
-            f"""
-            @{value}
-            D=A
-            @SP
-            A=M
-            M=D
-            @SP
-            M=M+1
-            """
-        )
-
-    def _build_add(self) -> str:
-        """
-        SP--
-        temp0 = *SP
-        SP--
-        *SP = *SP - temp0
-        SP++
-        """
-        return dedent(
-            """
-            @SP
-            M=M-1
-            A=M
-            D=M
-            @SP
-            M=M-1
-            A=M
-            M=M+D
-            @SP
-            M=M+1
-            """
-        )
-
-    def _build_sub(self) -> str:
-        """
-        SP--
-        temp0 = *SP
-        SP--
-        *SP = *SP - temp0
-        SP++
-        """
-        return dedent(
-            """
-            @SP
-            M=M-1
-            A=M
-            D=M
-            @SP
-            M=M-1
-            A=M
-            M=M-D
-            @SP
-            M=M+1
-            """
+    def _get_pointer(self) -> str:
+        """Returns the appropriate label for the pointer"""
+        if self.value == 0:
+            return "THIS"
+        if self.value == 1:
+            return "THAT"
+        raise InvalidSegmentException(
+            f"Expected pointer be 0 or 1 but got {self.value}"
         )
 
-    def _build_eq(self) -> str:
-        """
-        eq -> x==0
-
 
-        SP--
-        temp0 = *SP
-        SP--
-        *SP = 0 == temp0
-        SP++
-        """
-        return dedent(
-            f"""
-            // SP--
-            @SP
-            M=M-1
-            // D = *SP
-            A=M
-            D=M
-            // SP--
-            @SP
-            M=M-1
-            // D = *SP - D  <--> x - y
-            A=M
-            D=M-D
-            M=D
-    
-            // if x == 0
-            @IS_EQ{self.label_suffix}
-            D;JEQ
-            // else
-            @ELSE{self.label_suffix}
-            D;JNE
-    
-            (IS_EQ{self.label_suffix})
-            // True in Hack ASM is -1
-            @SP
-            A=M
-            M=-1
-            // SP++
-            @SP
-            M=M+1
-            @END_IF{self.label_suffix}
-            0;JEQ
-    
-            (ELSE{self.label_suffix})
-            // False in Hack ASM is 0
-            @SP
-            A=M
-            M=0
-            // SP++
-            @SP
-            M=M+1
-    
-            (END_IF{self.label_suffix})
-            D=0
-            """
-        )
+# Comparison commands built without a label suffix, expanded once at import.
+_UNLABELLED_ASM = {
+    cmd: sys.intern(ByteCodeInst("", cmd)._build_asm()) for cmd in LABELLED_COMMANDS
+}
 
-    def _build_lt(self) -> str:
-        """
-        lt -> x < y
-
-        SP--
-        x = *SP
-        SP--
-        y = *SP
-        *SP = -1 if x < y else 0
-        SP++
-        """
-        return dedent(
-            f"""
-            // SP--
-            @SP
-            M=M-1
-            // D = *SP
-            A=M
-            D=M
-            // SP--
-            @SP
-            M=M-1
-            // D = *SP - D  <--> x - y
-            A=M
-            D=M-D
-            M=D
-
-            // if x < 0
-            @IS_LESS_THAN{self.label_suffix}
-            D;JLT
-            // else
-            @ELSE{self.label_suffix}
-            D;JGE
-
-            (IS_LESS_THAN{self.label_suffix})
-            // True in Hack ASM is -1
-            @SP
-            A=M
-            M=-1
-            // SP++
-            @SP
-            M=M+1
-            @END_IF{self.label_suffix}
-            0;JEQ
-
-            (ELSE{self.label_suffix})
-            // False in Hack ASM is 0
-            @SP
-            A=M
-            M=0
-            // SP++
-            @SP
-            M=M+1
-            
-            (END_IF{self.label_suffix})
-            D=0
-            """
-        )
 
-    def _build_gt(self) -> str:
-        """
-        lt -> x > y
-
-        SP--
-        x = *SP
-        SP--
-        y = *SP
-        *SP = -1 if x > y else 0
-        SP++
-        """
-        return dedent(
-            f"""
-            // SP--
-            @SP
-            M=M-1
-            // D = *SP
-            A=M
-            D=M
-            // SP--
-            @SP
-            M=M-1
-            // D = *SP - D  <--> x - y
-            A=M
-            D=M-D
-            M=D
-
-            // if x > 0
-            @IS_GT{self.label_suffix}
-            D;JGT
-            // else
-            @ELSE{self.label_suffix}
-            D;JLE
-
-            (IS_GT{self.label_suffix})
-            // True in Hack ASM is -1
-            @SP
-            A=M
-            M=-1
-            // SP++
-            @SP
-            M=M+1
-            @END_IF{self.label_suffix}
-            0;JEQ
-
-            (ELSE{self.label_suffix})
-            // False in Hack ASM is 0
-            @SP
-            A=M
-            M=0
-            // SP++
-            @SP
-            M=M+1
-
-            (END_IF{self.label_suffix})
-            D=0
-            """
-        )
-
-    def _build_not(self):
-        """
-         not -> !x
-
-         SP--
-         x = *SP
-         *SP = !*SP
-         SP++
-         """
-        return dedent(
-            f"""
-            // SP--
-            @SP
-            M=M-1
-            // D = *SP
-            A=M
-            D=M
-            // *SP = !D
-            @SP
-            A=M
-            M=!D
-            @SP
-            M=M+1
-            """
-        )
-
-    def _build_neg(self):
-        """
-         neg -> -x
-
-         SP--
-         x = *SP
-         *SP = 0 - *SP
-         SP++
-         """
-        return dedent(
-            f"""
-            // SP--
-            @SP
-            M=M-1
-            // D = *SP
-            A=M
-            D=M
-            // *SP = 0 - D
-            @SP
-            A=M
-            M=-D
-            @SP
-            M=M+1
-            """
-        )
+@functools.lru_cache(maxsize=8192)
+def _emit_asm(
+    cmd: Command,
+    segment: Optional[Segment],
+    value: Optional[int],
+    static_label: Optional[str],
+) -> str:
+    """
+    Builds the assembly for a byte code operation that does not need a
+    label. Cached since the output only depends on the instruction fields.
+    """
+    return ByteCodeInst("", cmd, segment, value, static_label)._build_asm()
 
-    def _build_and(self) -> str:
-        """
-        SP--
-        temp0 = *SP
-        SP--
-        *SP = *SP & temp0
-        SP++
-        """
-        return dedent(
-            """
-            @SP
-            M=M-1
-            A=M
-            D=M
-            @SP
-            M=M-1
-            A=M
-            M=M&D
-            @SP
-            M=M+1
-            """
-        )
 
-    def _build_or(self) -> str:
-        """
-        SP--
-        temp0 = *SP
-        SP--
-        *SP = *SP | temp0
-        SP++
-        """
-        return dedent(
-            """
-            @SP
-            M=M-1
-            A=M
-            D=M
-            @SP
-            M=M-1
-            A=M
-            M=M|D
-            @SP
-            M=M+1
-            """
-        )
+@functools.lru_cache(maxsize=4096)
+def _parse_fields(
+    line: str,
+) -> Tuple[Command, Optional[Segment], Optional[int]]:
+    """
+    Parses a single instruction into its command, segment and value.
+    Cached since VM programs repeat the same instructions over and over.
+    """
+    tokens = line.split(None, 2)
+    cmd = Command.from_string(tokens[0])
+    if len(tokens) != 3:
+        return cmd, None, None
 
-    def _build_push_segment(self):
-        """
-        addr = ARG + value
-        *SP = *addr
-        SP++
-        """
-        value = self.value
-        label = str(self.segment)
-        return dedent(
-            f"""
-            // D = offset
-            @{value}
-            D=A
-            // D = D + ARG
-            @{label}
-            D=D+M
-            // *SP = *D
-            A=D
-            D=M
-            @SP
-            A=M
-            M=D
-            // SP++
-            @SP
-            M=M+1
-            """
-        )
+    _, raw_seg, value = tokens
+    return cmd, Segment.from_string(raw_seg), int(value)
 
-    def _build_pop_segment(self):
-        """
-        addr = segmentPointer + offset
-        SP--
-        *addr = *SP
-        """
-        value = self.value
-        label = str(self.segment)
-        return dedent(
-            f"""
-            // D = offset
-            @{value}
-            D=A
-            // D = offset + segmentPointer
-            @{label}
-            D=D+M
-            // SP--
-            @SP
-            M=M-1
-            A=M
-            D=D+M  // addr = addr + RAM[SP]
-            A=D-M  // A = addr - RAM[SP] 
-            M=D-A  // RAM[A] = addr - A
-            """
-        )
 
-    def _build_push_temp(self):
-        """
-        addr = ARG + value
-        *SP = *addr
-        SP++
-        """
-        value = self.value
-        return dedent(
-            f"""
-              // i = offset
-              @{value}
-              D=A
-              // addr = i + 5
-              @5
-              D=D+A
-              // *SP = *addr
-              A=D
-              D=M
-              @SP
-              A=M
-              M=D
-              // SP++
-              @SP
-              M=M+1
-              """
-        )
+def translate_line(line: str, static_label: Optional[str] = None) -> str:
+    """
+    Translates a single clean instruction to assembly. Parsing and, for
+    instructions that do not need a unique label, the assembly itself go
+    through the bounded caches above.
+    """
+    cmd, segment, value = _parse_fields(line)
+    if cmd in LABELLED_COMMANDS:
+        label_suffix = _next_label_suffix(static_label)
+        return ByteCodeInst(label_suffix, cmd, segment, value, static_label).to_asm()
+    if segment != Segment.STATIC:
+        static_label = None
+    return _emit_asm(cmd, segment, value, static_label)
 
-    def _build_pop_temp(self):
-        """
-        addr = ARG + value
-        SP--
-        *addr = *SP
-        """
-        value = self.value
-        return dedent(
-            f"""
-              @{value}
-              D=A // D = i
-              @5
-              D=D+A // addr = 5 + i
-              @SP
-              M=M-1
-              A=M
-              D=D+M  // addr = addr + RAM[SP]
-              A=D-M  // A = addr - RAM[SP] 
-              M=D-A  // RAM[A] = addr - A
-              """
-        )
 
-    def _build_push_static(self):
-        """
-        *SP = *static
-        SP++
-        """
-        value = self.value
-        static_label = self.static_label
-        return dedent(
-            f"""
-              @{static_label}.{value}
-              D=M
-              @SP
-              A=M
-              M=D
-              // SP++
-              @SP
-              M=M+1
-              """
-        )
+_PUSH_CONSTANT_PREFIX = "push constant "
 
-    def _build_pop_static(self):
-        """
-        SP--
-        *static = *SP
-        """
-        value = self.value
-        static_label = self.static_label
-        return dedent(
-            f"""
-              // SP--
-              @SP
-              M=M-1
-              // temp = *SP
-              A=M
-              D=M
-              // *static = temp
-              @{static_label}.{value}
-              M=D
-              """
-        )
+# Assembly of a fused "push constant value" followed by a binary command,
+# keyed on the command's token. Fused pairs never go through the
+# (command, segment) emitters, so source text can't reach them.
+_CONSTANT_OPERAND_ASM = {
+    token: _asm(_CONSTANT_OPERAND_TMPL.format(op=_CONSTANT_OPERATORS[cmd]))
+    for token, cmd in _CMD_FROM_TOKEN.items()
+    if cmd in _CONSTANT_OPERATORS
+}
 
-    def _get_pointer(self) -> str:
-        """Returns the appropriate label for the pointer"""
-        pointers = {1: "THAT", 0: "THIS"}
-        try:
-            return pointers[self.value]
-        except KeyError:
-            raise InvalidSegmentException(
-                f"Expected pointer be 0 or 1 but got {self.value}"
-            )
-
-    def _build_push_pointer(self):
-        """
-        *SP = THIS/THAT
-        SP++
-        """
-        return dedent(
-            f"""
-              // temp = THIS
-              @{self._get_pointer()}
-              D=M
-              // *SP = temp
-              @SP
-              A=M
-              M=D
-              // SP++
-              @SP
-              M=M+1
-              """
-        )
 
-    def _build_pop_pointer(self):
-        """
-        *SP = THIS/THAT
-        SP++
-        """
-        return dedent(
-            f"""
-              // SP--
-              @SP
-              M=M-1
-              // temp = *SP
-              A=M
-              D=M
-              // pointer = temp
-              @{self._get_pointer()}
-              M=D
-              """
-        )
+def fuse(lines: Iterable[str], static_label: Optional[str] = None) -> Iterator[str]:
+    """
+    Translates clean, lower case instructions to assembly with a peephole
+    pass. A "push constant k" directly followed by add, sub, and or or is
+    folded into a single block which applies k to the top of the stack,
+    instead of pushing it and popping it straight back.
+    """
+    pending = None
+    for line in lines:
+        if pending is not None:
+            template = _CONSTANT_OPERAND_ASM.get(line)
+            if template is not None:
+                yield template % int(pending[len(_PUSH_CONSTANT_PREFIX) :])
+                pending = None
+                continue
+            yield translate_line(pending, static_label)
+            pending = None
+        if line.startswith(_PUSH_CONSTANT_PREFIX):
+            pending = line
+        else:
+            yield translate_line(line, static_label)
+    if pending is not None:
+        yield translate_line(pending, static_label)
 
 
-def parse(ins: str, filename: str) -> List[ByteCodeInst]:
+def parse(ins: str, filename: str) -> Iterator[ByteCodeInst]:
     """
-    Parses a instruction a set of bytecode instructions as string
-    to a list of ByteCodeInst.
+    Lazily parses a set of bytecode instructions as string into
+    ByteCodeInst, one line at a time. Comments and blank lines are
+    skipped and lines are lowercased on the way, so the source doesn't
+    need to be cleaned first.
     """
-    for line in ins.split(NEW_LINE_TOKEN):
-        yield ByteCodeInst.from_string(line, static_label=filename)
+    for line in ins.splitlines():
+        line = line.partition(COMMENT_TOKEN)[0].strip().lower()
+        if line:
+            yield ByteCodeInst.from_string(line, static_label=filename)